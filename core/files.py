@@ -0,0 +1,84 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Handles common file issues.
+"""
+import json
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class FileLock(object):
+    """
+    An exclusive lock shared between processes, held with a with statement.
+    """
+    def __init__(self, pathname):
+        """
+        Args:
+            pathname (string): The full pathname of the lock file. It is
+                created if it does not exist.
+        """
+        self.pathname = pathname
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.pathname, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+def write_json(data, pathname):
+    """
+    Writes data to a json file. The data is written to a temporary file
+    first and renamed over the old file, so a crash never leaves a half
+    written file behind.
+
+    Args:
+        data (object): The data to write.
+        pathname (string): The full pathname to the json file.
+    """
+    temp = pathname + '.tmp'
+    with open(temp, 'w') as json_file:
+        json.dump(data, json_file, sort_keys=True)
+
+    # Windows can not rename over an existing file
+    if os.name == 'nt' and os.path.isfile(pathname):
+        os.remove(pathname)
+    os.rename(temp, pathname)
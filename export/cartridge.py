@@ -25,11 +25,51 @@
 The cartridge deals with the raw .nes file format. It's primary function is
 to read and parse the file into a usable dictionary.
 """
+import hashlib
 import struct
+import zlib
 import numpy
 
+HEADER_SIZE = 16
 PROG_ROM_SIZE = 16384
 CHR_ROM_SIZE = 4096
+READ_SIZE = 65536
+
+class Digest(object):
+    """
+    Computes the size, CRC32, MD5 and SHA1 of a stream of data in a single
+    pass.
+    """
+    def __init__(self):
+        self.size = 0
+        self.crc32 = 0
+        self.md5 = hashlib.md5()
+        self.sha1 = hashlib.sha1()
+
+    def update(self, data):
+        """
+        Adds more data to all of the digests.
+
+        Args:
+            data (string): The raw bytes to add.
+        """
+        self.size += len(data)
+        self.crc32 = zlib.crc32(data, self.crc32)
+        self.md5.update(data)
+        self.sha1.update(data)
+
+    def hexdigests(self):
+        """
+        Gets the current digests as lower case hex strings.
+
+        Returns:
+            dict: The SIZE key mapped to the number of bytes, and the CRC32,
+                MD5 and SHA1 keys mapped to their hex strings.
+        """
+        return {'SIZE': self.size,
+                'CRC32': '%08x' % (self.crc32 & 0xFFFFFFFF),
+                'MD5': self.md5.hexdigest(),
+                'SHA1': self.sha1.hexdigest()}
 
 def read_header(raw):
     """
@@ -77,7 +117,24 @@ def read_header(raw):
     return header, struct.unpack('B', raw[4])[0], \
             struct.unpack('B', raw[5])[0] * 2
 
-def parse_file(pathname):
+def _read_bank(nes_file, size, digests):
+    """
+    Reads a single bank from the .nes file and feeds it to the digests.
+
+    Args:
+        nes_file (file): The open .nes file.
+        size (int): The number of bytes in the bank.
+        digests (list): The Digest objects to update.
+
+    Returns:
+        array: The bank as a numpy array.
+    """
+    raw = nes_file.read(size)
+    for digest in digests:
+        digest.update(raw)
+    return numpy.frombuffer(raw, dtype='uint8').copy()
+
+def parse_file(pathname, hashes=False):
     """
     Parses the .nes file into a usable dictionary. In addition to the header
     keys, this adds the following keys:
@@ -86,31 +143,49 @@ def parse_file(pathname):
         CHR_ROM (list): A list of numpy arrays representing the character
             read only memory. This is double the number represented in the
             header, because it separates out the left and right sections.
+        HASHES (dict): Only added if hashes is True. ROM maps to the digests
+            of everything after the header, FILE maps to the digests of the
+            whole file. Each is a dict of the SIZE in bytes and the
+            CRC32, MD5 and SHA1 hex strings.
 
     Args:
         pathname (string): The full pathname to the .nes file.
+        hashes (Optional[bool]): Should the digests be computed while the
+            file is read?
 
     Returns:
         dict: Key value pairs for all metadata.
     """
+    rom_digest = Digest()
+    file_digest = Digest()
+    digests = [rom_digest, file_digest] if hashes else []
+
     with open(pathname, 'rb') as nes_file:
-        raw = nes_file.read(16)
+        raw = nes_file.read(HEADER_SIZE)
         header, prog_rom_size, chr_rom_size = read_header(raw)
+        if hashes:
+            file_digest.update(raw)
 
         # Load programming read only memory
         header['PROG_ROM'] = []
         for _ in range(0, prog_rom_size):
             header['PROG_ROM'].append( \
-                    numpy.fromfile(nes_file,
-                                   dtype='uint8',
-                                   count=PROG_ROM_SIZE))
+                    _read_bank(nes_file, PROG_ROM_SIZE, digests))
 
         header['CHR_ROM'] = []
         for _ in range(0, chr_rom_size):
             header['CHR_ROM'].append( \
-                    numpy.fromfile(nes_file,
-                                   dtype='uint8',
-                                   count=CHR_ROM_SIZE))
+                    _read_bank(nes_file, CHR_ROM_SIZE, digests))
 
-        return header
+        if hashes:
+            # Anything past the banks is still part of the dumped rom
+            raw = nes_file.read(READ_SIZE)
+            while raw:
+                rom_digest.update(raw)
+                file_digest.update(raw)
+                raw = nes_file.read(READ_SIZE)
+
+            header['HASHES'] = {'ROM': rom_digest.hexdigests(),
+                                'FILE': file_digest.hexdigests()}
 
+        return header
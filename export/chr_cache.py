@@ -0,0 +1,316 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Caches decoded CHR ROM tiles on disk so they only need to be extracted once.
+All tiles for a library are stored back to back in a single raw file of
+8x8 uint8 images, which is opened with memory mapping. A json index maps
+the SHA1 of each rom (without the header) to its tiles in that file, and
+maps each source file to its SHA1 by size and modification time so
+unchanged files are never read.
+
+Several processes can share a cache. Appending tiles, saving the index and
+compacting all take a lock and merge with the index on disk first.
+"""
+import json
+import os
+import numpy
+from core.files import FileLock, write_json
+from export.cartridge import parse_file
+from export.chr_extract import extract_all
+
+TILE_SHAPE = (8, 8)
+TILE_SIZE = 64
+
+def _discard(index, key):
+    """
+    Removes a rom and every source that points at it from an index.
+
+    Args:
+        index (dict): The index to update.
+        key (string): The SHA1 of the rom without the header.
+    """
+    index['TILES'].pop(key, None)
+    sources = index['SOURCES']
+    for source in [s for s in sources if sources[s]['KEY'] == key]:
+        del sources[source]
+
+class TileCache(object):
+    """
+    A library wide cache of decoded CHR ROM tiles. New tiles are appended
+    to the data file straight away, but the index is only written by save.
+    """
+    def __init__(self, pathname):
+        """
+        Opens the cache, creating it if it does not exist. The data file is
+        mapped straight away, so it stays readable even if another process
+        compacts the cache.
+
+        Args:
+            pathname (string): The full pathname of the cache without an
+                extension. The index is kept in pathname.json, the data in
+                pathname.N.tiles, where N is bumped by each compact, and
+                the lock in pathname.lock.
+        """
+        self.pathname = pathname
+        self.index_pathname = pathname + '.json'
+        self.lock_pathname = pathname + '.lock'
+        self.index = self._read_index()
+        self._tiles = None
+        self._map()
+
+        # Changes not yet merged into the index on disk
+        self._added = dict()
+        self._sources = dict()
+        self._discarded = set()
+
+    def _read_index(self):
+        """
+        Reads the index from disk.
+
+        Returns:
+            dict: The index, or an empty index if there is no index file.
+        """
+        if not os.path.isfile(self.index_pathname):
+            return {'GENERATION': 0, 'TILES': dict(), 'SOURCES': dict()}
+        with open(self.index_pathname, 'r') as index_file:
+            return json.load(index_file)
+
+    def _data_pathname(self, generation):
+        """
+        Gets the data file used by a generation of the index.
+
+        Args:
+            generation (int): The generation number.
+
+        Returns:
+            string: The full pathname to the data file.
+        """
+        return '%s.%d.tiles' % (self.pathname, generation)
+
+    def _map(self):
+        """
+        Gets every tile in the data file, mapping the file if needed.
+
+        Returns:
+            array: A read only Nx8x8 memory mapped array.
+        """
+        if self._tiles is None:
+            data_pathname = self._data_pathname(self.index['GENERATION'])
+            count = 0
+            if os.path.isfile(data_pathname):
+                count = os.path.getsize(data_pathname) // TILE_SIZE
+            if count == 0:
+                return numpy.zeros((0,) + TILE_SHAPE, dtype='uint8')
+            self._tiles = numpy.memmap(data_pathname,
+                                       dtype='uint8',
+                                       mode='r',
+                                       shape=(count,) + TILE_SHAPE)
+        return self._tiles
+
+    def _sync(self):
+        """
+        Merges the changes made by this cache into the index on disk. If
+        another process compacted the cache, tiles added here since the
+        last save are dropped, because their offsets are no longer valid.
+        The lock must be held.
+        """
+        index = self._read_index()
+        if index['GENERATION'] != self.index['GENERATION']:
+            self._added = dict()
+            self._tiles = None
+
+        for key in self._discarded:
+            _discard(index, key)
+        index['TILES'].update(self._added)
+        index['SOURCES'].update(self._sources)
+        self.index = index
+
+    def get(self, key):
+        """
+        Gets the cached tiles for a rom.
+
+        Args:
+            key (string): The SHA1 of the rom without the header.
+
+        Returns:
+            array: A read only Nx8x8 array of the tiles in every CHR ROM,
+                or None if the rom is not cached or its tiles are missing
+                from the data file.
+        """
+        entry = self.index['TILES'].get(key)
+        if entry is None:
+            return None
+        tiles = self._map()[entry['OFFSET']:entry['OFFSET'] + entry['COUNT']]
+        if len(tiles) != entry['COUNT']:
+            return None
+        return tiles
+
+    def add(self, key, chr_rom):
+        """
+        Extracts the tiles from CHR ROM and appends them to the cache.
+
+        Args:
+            key (string): The SHA1 of the rom without the header.
+            chr_rom (list): The CHR_ROM arrays from parse_file.
+
+        Returns:
+            array: A read only Nx8x8 array of the cached tiles.
+        """
+        # Decode everything first so a bad bank can not leave a partial
+        # entry in the data file
+        banks = [extract_all(bank) for bank in chr_rom]
+
+        with FileLock(self.lock_pathname):
+            self._sync()
+            data_pathname = self._data_pathname(self.index['GENERATION'])
+            with open(data_pathname, 'a+b') as data_file:
+                # Drop any partial tile left behind by a failed write
+                data_file.seek(0, os.SEEK_END)
+                offset = data_file.tell() // TILE_SIZE
+                data_file.truncate(offset * TILE_SIZE)
+                data_file.seek(offset * TILE_SIZE)
+                for tiles in banks:
+                    tiles.tofile(data_file)
+
+        entry = {'OFFSET': offset, 'COUNT': sum(len(t) for t in banks)}
+        self.index['TILES'][key] = entry
+        self._added[key] = entry
+        self._discarded.discard(key)
+        self._tiles = None
+        return self.get(key)
+
+    def discard(self, key):
+        """
+        Removes a rom from the index. The space in the data file is only
+        reclaimed by compact.
+
+        Args:
+            key (string): The SHA1 of the rom without the header.
+        """
+        _discard(self.index, key)
+        self._added.pop(key, None)
+        for source in [s for s in self._sources
+                       if self._sources[s]['KEY'] == key]:
+            del self._sources[source]
+        self._discarded.add(key)
+
+    def load(self, pathname):
+        """
+        Gets the tiles for a .nes file. If the file has the same size and
+        modification time as when it was cached, it is not read at all.
+        Otherwise it is parsed, and if its hash changed the stale tiles are
+        discarded.
+
+        Args:
+            pathname (string): The full pathname to the .nes file.
+
+        Returns:
+            array: A read only Nx8x8 array of the tiles in every CHR ROM.
+        """
+        stat = os.stat(pathname)
+        source = os.path.abspath(pathname)
+        sources = self.index['SOURCES']
+        cached = sources.get(source)
+        if cached is not None and cached['SIZE'] == stat.st_size and \
+                cached['MTIME'] == stat.st_mtime:
+            tiles = self.get(cached['KEY'])
+            if tiles is not None:
+                return tiles
+
+        cart = parse_file(pathname, hashes=True)
+        key = cart['HASHES']['ROM']['SHA1']
+        if cached is not None and cached['KEY'] != key:
+            del sources[source]
+            if cached['KEY'] not in [s['KEY'] for s in sources.values()]:
+                self.discard(cached['KEY'])
+        sources[source] = {'KEY': key,
+                           'SIZE': stat.st_size,
+                           'MTIME': stat.st_mtime}
+        self._sources[source] = sources[source]
+
+        tiles = self.get(key)
+        if tiles is None:
+            tiles = self.add(key, cart['CHR_ROM'])
+        return tiles
+
+    def compact(self):
+        """
+        Drops the tiles of source files that no longer exist, rewrites the
+        data file without any discarded tiles and saves the index. The
+        tiles are written to a new data file, so the old index and data
+        file stay valid until the new index replaces them.
+        """
+        with FileLock(self.lock_pathname):
+            self._sync()
+            sources = self.index['SOURCES']
+            for source in [s for s in sources if not os.path.isfile(s)]:
+                key = sources.pop(source)['KEY']
+                if key not in [s['KEY'] for s in sources.values()]:
+                    _discard(self.index, key)
+
+            # Other processes may have appended since the file was mapped
+            self._tiles = None
+            generation = self.index['GENERATION'] + 1
+            entries = dict()
+            with open(self._data_pathname(generation), 'wb') as data_file:
+                offset = 0
+                for key in self.index['TILES']:
+                    tiles = self.get(key)
+                    if tiles is None:
+                        continue
+                    tiles.tofile(data_file)
+                    entries[key] = {'OFFSET': offset, 'COUNT': len(tiles)}
+                    offset += len(tiles)
+
+            old_pathname = self._data_pathname(self.index['GENERATION'])
+            self.index['GENERATION'] = generation
+            self.index['TILES'] = entries
+            self._write()
+
+        self._tiles = None
+        self._map()
+        try:
+            os.remove(old_pathname)
+        except OSError:
+            # Windows will not remove a file another process has mapped
+            pass
+
+    def _write(self):
+        """
+        Writes the index and forgets the changes it now holds. The lock
+        must be held.
+        """
+        write_json(self.index, self.index_pathname)
+        self._added = dict()
+        self._sources = dict()
+        self._discarded = set()
+
+    def save(self):
+        """
+        Merges the index with the one on disk and writes it, so the cached
+        tiles can be used by a later run.
+        """
+        with FileLock(self.lock_pathname):
+            self._sync()
+            self._write()
@@ -50,6 +50,24 @@ def extract(chr_rom, tile):
     plane2 = numpy.left_shift(plane2, 1)
     return numpy.bitwise_or(plane1, plane2).reshape((8, 8))
 
+def extract_all(chr_rom):
+    """
+    Extracts every 8x8 image from CHR ROM at once.
+
+    Args:
+        chr_rom (array): The numpy array representing CHR ROM. If the rom
+            was truncated, the incomplete tile at the end is ignored.
+
+    Returns:
+        array: A Nx8x8 array with one image per tile.
+    """
+    count = len(chr_rom) // 16
+    tiles = chr_rom[:count * 16].reshape((count, 2, 8))
+    plane1 = numpy.unpackbits(tiles[:, 0], axis=1)
+    plane2 = numpy.unpackbits(tiles[:, 1], axis=1)
+    plane2 = numpy.left_shift(plane2, 1)
+    return numpy.bitwise_or(plane1, plane2).reshape((-1, 8, 8))
+
 def extract_pngs(chr_rom, index=0, directory='.'):
     """
     Extracts all images from CHR ROM and saves them off as individual
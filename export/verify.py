@@ -0,0 +1,156 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Verifies .nes files against No-Intro style DAT files. The DAT is loaded into
+a hash index once, and the digests of each rom are cached by size and
+modification time so unchanged files are never read twice.
+"""
+import json
+import os
+import xml.etree.ElementTree as ElementTree
+from core.files import write_json
+from export.cartridge import parse_file
+
+HASH_TYPES = ['SHA1', 'MD5', 'CRC32']
+DAT_ATTRIBUTES = {'CRC32': 'crc', 'MD5': 'md5', 'SHA1': 'sha1'}
+
+def load_dat(pathname):
+    """
+    Loads a Logiqx XML DAT file into a hash index. Each rom entry in the
+    index is a dictionary with the following keys:
+        GAME (string): The name of the game the rom belongs to.
+        NAME (string): The file name of the rom.
+        SIZE (int): The size of the rom in bytes.
+
+    Args:
+        pathname (string): The full pathname to the DAT file.
+
+    Returns:
+        dict: Maps SHA1, MD5 and CRC32 to a dict of lower case hex digests
+            to lists of rom entries. A digest can have several entries,
+            because DATs repeat identical dumps under different games.
+    """
+    index = dict((hash_type, dict()) for hash_type in HASH_TYPES)
+    for game in ElementTree.parse(pathname).getroot().iter('game'):
+        for rom in game.iter('rom'):
+            entry = {'GAME': game.get('name'),
+                     'NAME': rom.get('name'),
+                     'SIZE': int(rom.get('size', 0))}
+            for hash_type in HASH_TYPES:
+                value = rom.get(DAT_ATTRIBUTES[hash_type])
+                if value:
+                    index[hash_type].setdefault(value.lower(), []) \
+                            .append(entry)
+    return index
+
+def match(index, hashes):
+    """
+    Finds the DAT entry for a set of rom digests. The strongest hash
+    available is tried first, and the header-less digests are tried before
+    the whole file digests. A CRC32 is too weak to trust on its own, so a
+    CRC32 match is rejected if the size does not match as well. If several
+    entries share a digest, the first one that passes is returned.
+
+    Args:
+        index (dict): The hash index from load_dat.
+        hashes (dict): The HASHES value from parse_file.
+
+    Returns:
+        dict: The matching rom entry, or None if there is no match.
+    """
+    for hash_type in HASH_TYPES:
+        for section in ['ROM', 'FILE']:
+            for entry in index[hash_type].get(hashes[section][hash_type], []):
+                if hash_type == 'CRC32' and \
+                        entry['SIZE'] != hashes[section]['SIZE']:
+                    continue
+                return entry
+    return None
+
+def load_cache(pathname):
+    """
+    Loads a verification cache written by save_cache.
+
+    Args:
+        pathname (string): The full pathname to the cache file.
+
+    Returns:
+        dict: The cache, or an empty cache if the file does not exist.
+    """
+    if not os.path.isfile(pathname):
+        return dict()
+    with open(pathname, 'r') as cache_file:
+        return json.load(cache_file)
+
+def save_cache(cache, pathname):
+    """
+    Saves a verification cache so it can be used by a later run.
+
+    Args:
+        cache (dict): The cache to save.
+        pathname (string): The full pathname to the cache file.
+    """
+    write_json(cache, pathname)
+
+def file_hashes(pathname, cache=None):
+    """
+    Gets the digests for a .nes file. If the cache holds an entry with the
+    same size and modification time the file is not read at all, otherwise
+    the file is parsed and the cache is updated.
+
+    Args:
+        pathname (string): The full pathname to the .nes file.
+        cache (Optional[dict]): The verification cache.
+
+    Returns:
+        dict: The HASHES value from parse_file.
+    """
+    stat = os.stat(pathname)
+    key = os.path.abspath(pathname)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None and cached['SIZE'] == stat.st_size and \
+                cached['MTIME'] == stat.st_mtime:
+            return cached['HASHES']
+
+    hashes = parse_file(pathname, hashes=True)['HASHES']
+    if cache is not None:
+        cache[key] = {'SIZE': stat.st_size,
+                      'MTIME': stat.st_mtime,
+                      'HASHES': hashes}
+    return hashes
+
+def verify_file(pathname, index, cache=None):
+    """
+    Verifies a single .nes file against a DAT hash index.
+
+    Args:
+        pathname (string): The full pathname to the .nes file.
+        index (dict): The hash index from load_dat.
+        cache (Optional[dict]): The verification cache.
+
+    Returns:
+        dict: The matching rom entry, or None if there is no match.
+    """
+    return match(index, file_hashes(pathname, cache))
@@ -25,9 +25,11 @@
 Test cartridge parsing
 """
 from export.cartridge import read_header, parse_file
-from export.cartridge import PROG_ROM_SIZE, CHR_ROM_SIZE
+from export.cartridge import PROG_ROM_SIZE, CHR_ROM_SIZE, READ_SIZE
 import unittest
+import hashlib
 import struct
+import zlib
 import numpy
 import os
 
@@ -299,6 +301,49 @@ class TestROM(unittest.TestCase):
             self.assertTrue(numpy.array_equal(array, cart['CHR_ROM'][i]))
             i += 1
 
+    def test_hashes(self):
+        """
+        Ensure the digests match the rom with and without the header
+        """
+        cart = parse_file(self.filename)
+        self.assertFalse('HASHES' in cart)
+
+        cart = parse_file(self.filename, hashes=True)
+        with open(self.filename, 'rb') as nes_file:
+            raw = nes_file.read()
+
+        for section, data in [('FILE', raw), ('ROM', raw[16:])]:
+            hashes = cart['HASHES'][section]
+            self.assertEqual(hashes['CRC32'],
+                             '%08x' % (zlib.crc32(data) & 0xFFFFFFFF))
+            self.assertEqual(hashes['MD5'], hashlib.md5(data).hexdigest())
+            self.assertEqual(hashes['SHA1'], hashlib.sha1(data).hexdigest())
+            self.assertEqual(hashes['SIZE'], len(data))
+
+    def test_hashes_trailing_data(self):
+        """
+        Ensure the digests cover a trainer and any data after the banks
+        """
+        raw = 'NES\x1a\x01\x01\x04\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+        with open(self.filename, 'wb') as nes_file:
+            nes_file.write(raw)
+            # Trainer, banks, then more than one read of trailing data
+            numpy.random.randint(256, size=512 + PROG_ROM_SIZE + \
+                    CHR_ROM_SIZE * 2 + READ_SIZE + 100) \
+                    .astype('uint8').tofile(nes_file)
+
+        cart = parse_file(self.filename, hashes=True)
+        with open(self.filename, 'rb') as nes_file:
+            raw = nes_file.read()
+
+        for section, data in [('FILE', raw), ('ROM', raw[16:])]:
+            hashes = cart['HASHES'][section]
+            self.assertEqual(hashes['SIZE'], len(data))
+            self.assertEqual(hashes['CRC32'],
+                             '%08x' % (zlib.crc32(data) & 0xFFFFFFFF))
+            self.assertEqual(hashes['MD5'], hashlib.md5(data).hexdigest())
+            self.assertEqual(hashes['SHA1'], hashlib.sha1(data).hexdigest())
+
 
 if __name__ == '__main__':
     unittest.main()
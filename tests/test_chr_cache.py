@@ -0,0 +1,207 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Tests the CHR ROM tile cache
+"""
+from export.chr_cache import TileCache
+from export.chr_extract import extract_all
+from export.cartridge import PROG_ROM_SIZE, CHR_ROM_SIZE
+import unittest
+import numpy
+import os
+import shutil
+
+class TestTileCache(unittest.TestCase):
+    """
+    Test caching decoded tiles
+    """
+    def setUp(self):
+        self.directory = './test_chr_cache_dir'
+        if os.path.isdir(self.directory):
+            shutil.rmtree(self.directory)
+        os.makedirs(self.directory)
+        self.pathname = os.path.join(self.directory, 'library')
+        self.filename = os.path.join(self.directory, 'game.nes')
+        self.other_filename = os.path.join(self.directory, 'other.nes')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_rom(self, chr_size=CHR_ROM_SIZE * 2, filename=None,
+                  mtime=1000000000):
+        """
+        Writes a rom with random banks and returns the expected tiles. The
+        modification time is set to a whole number of seconds, so setting
+        it again gives exactly the same value.
+        """
+        if filename is None:
+            filename = self.filename
+        raw = 'NES\x1a\x01\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+        chr_rom = numpy.random.randint(256, size=chr_size).astype('uint8')
+        with open(filename, 'wb') as nes_file:
+            nes_file.write(raw)
+            numpy.random.randint(256, size=PROG_ROM_SIZE) \
+                    .astype('uint8').tofile(nes_file)
+            chr_rom.tofile(nes_file)
+        os.utime(filename, (mtime, mtime))
+        return extract_all(chr_rom)
+
+    def test_load(self):
+        """
+        Ensure tiles are extracted once and reloaded from disk
+        """
+        expected = self.write_rom()
+
+        cache = TileCache(self.pathname)
+        tiles = cache.load(self.filename)
+        self.assertEqual(tiles.shape, (512, 8, 8))
+        self.assertTrue(numpy.array_equal(tiles, expected))
+        cache.save()
+
+        # Rewrite the rom with the same size and modification time to
+        # prove an unchanged file is not read again
+        self.write_rom()
+
+        cache = TileCache(self.pathname)
+        tiles = cache.load(self.filename)
+        self.assertTrue(isinstance(tiles, numpy.memmap))
+        self.assertTrue(numpy.array_equal(tiles, expected))
+
+    def test_invalidate(self):
+        """
+        Ensure a changed rom replaces its old tiles
+        """
+        self.write_rom()
+        cache = TileCache(self.pathname)
+        cache.load(self.filename)
+        old_key = list(cache.index['TILES'].keys())[0]
+
+        expected = self.write_rom(mtime=1000000010)
+        cache.load(self.filename)
+        self.assertEqual(cache.get(old_key), None)
+
+        old_data = self.pathname + '.0.tiles'
+        size = os.path.getsize(old_data)
+        cache.compact()
+        self.assertFalse(os.path.isfile(old_data))
+        self.assertEqual(os.path.getsize(self.pathname + '.1.tiles'),
+                         size // 2)
+
+        cache = TileCache(self.pathname)
+        self.assertTrue(numpy.array_equal(cache.load(self.filename),
+                                          expected))
+
+    def test_truncated(self):
+        """
+        Ensure a truncated CHR ROM caches only its complete tiles
+        """
+        expected = self.write_rom(CHR_ROM_SIZE + 100)
+        self.assertEqual(len(expected), 262)
+
+        cache = TileCache(self.pathname)
+        tiles = cache.load(self.filename)
+        self.assertTrue(numpy.array_equal(tiles, expected))
+
+    def test_interleaved(self):
+        """
+        Ensure two caches adding at the same time keep each other's tiles
+        """
+        expected = self.write_rom()
+        other_expected = self.write_rom(filename=self.other_filename)
+
+        first = TileCache(self.pathname)
+        second = TileCache(self.pathname)
+        first.load(self.filename)
+        second.load(self.other_filename)
+        second.save()
+        first.save()
+
+        cache = TileCache(self.pathname)
+        self.assertEqual(len(cache.index['TILES']), 2)
+        self.assertEqual(len(cache.index['SOURCES']), 2)
+        self.assertTrue(numpy.array_equal(cache.load(self.filename),
+                                          expected))
+        self.assertTrue(numpy.array_equal(cache.load(self.other_filename),
+                                          other_expected))
+
+    def test_compact_while_open(self):
+        """
+        Ensure a cache opened before another one compacts keeps working,
+        and that the tiles of deleted roms are reclaimed
+        """
+        expected = self.write_rom()
+        self.write_rom(filename=self.other_filename)
+        cache = TileCache(self.pathname)
+        cache.load(self.filename)
+        cache.load(self.other_filename)
+        cache.save()
+        os.remove(self.other_filename)
+
+        first = TileCache(self.pathname)
+        second = TileCache(self.pathname)
+        second.compact()
+        self.assertEqual(len(second.index['TILES']), 1)
+        self.assertFalse(os.path.isfile(self.pathname + '.0.tiles'))
+        self.assertEqual(os.path.getsize(self.pathname + '.1.tiles'),
+                         512 * 64)
+
+        # The first cache still reads from the data file it mapped
+        self.assertTrue(numpy.array_equal(first.load(self.filename),
+                                          expected))
+
+        # Adding picks up the new generation
+        other_expected = self.write_rom(filename=self.other_filename)
+        first.load(self.other_filename)
+        first.save()
+        self.assertFalse(os.path.isfile(self.pathname + '.0.tiles'))
+
+        cache = TileCache(self.pathname)
+        self.assertEqual(cache.index['GENERATION'], 1)
+        self.assertTrue(numpy.array_equal(cache.load(self.filename),
+                                          expected))
+        self.assertTrue(numpy.array_equal(cache.load(self.other_filename),
+                                          other_expected))
+
+    def test_partial_tile(self):
+        """
+        Ensure a partial tile left by a failed write is overwritten
+        """
+        self.write_rom()
+        cache = TileCache(self.pathname)
+        cache.load(self.filename)
+        cache.save()
+        with open(self.pathname + '.0.tiles', 'ab') as data_file:
+            data_file.write('\xff' * 10)
+
+        expected = self.write_rom(filename=self.other_filename)
+        cache = TileCache(self.pathname)
+        cache.load(self.other_filename)
+        cache.save()
+
+        cache = TileCache(self.pathname)
+        self.assertTrue(numpy.array_equal(cache.load(self.other_filename),
+                                          expected))
+
+if __name__ == '__main__':
+    unittest.main()
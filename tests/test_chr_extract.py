@@ -24,7 +24,7 @@
 """
 Tests CHR ROM Extraction
 """
-from export.chr_extract import extract, extract_pngs
+from export.chr_extract import extract, extract_all, extract_pngs
 from export.cartridge import CHR_ROM_SIZE
 import unittest
 import numpy
@@ -55,6 +55,19 @@ class TestCHRExtract(unittest.TestCase):
         array = extract(inarray, 0)
         self.assertTrue(numpy.array_equal(array, expected))
 
+    def test_extract_all(self):
+        """
+        Ensure extracting every tile at once matches extracting them
+        individually
+        """
+        inarray = numpy.random.randint( \
+                256, size=CHR_ROM_SIZE).astype('uint8')
+        array = extract_all(inarray)
+        self.assertEqual(array.shape, (256, 8, 8))
+        for tile in range(0, 256):
+            self.assertTrue(numpy.array_equal(array[tile],
+                                              extract(inarray, tile)))
+
     def test_extract_pngs(self):
         """
         Ensure a 4096 buffer can write out 256 PNG files
@@ -0,0 +1,55 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Test common file handling
+"""
+from core.files import write_json
+import unittest
+import json
+import os
+
+class TestWriteJson(unittest.TestCase):
+    """
+    Test writing json files
+    """
+    def setUp(self):
+        self.filename = 'temp_files.json'
+
+    def tearDown(self):
+        for filename in [self.filename, self.filename + '.tmp']:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_overwrite(self):
+        """
+        Ensure an existing file is replaced and no temporary file is left
+        """
+        write_json({'VALUE': 1}, self.filename)
+        write_json({'VALUE': 2}, self.filename)
+        with open(self.filename, 'r') as json_file:
+            self.assertEqual(json.load(json_file), {'VALUE': 2})
+        self.assertFalse(os.path.isfile(self.filename + '.tmp'))
+
+if __name__ == '__main__':
+    unittest.main()
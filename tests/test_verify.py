@@ -0,0 +1,142 @@
+###############################################################################
+# The MIT License (MIT)                                                       #
+#                                                                             #
+# Copyright (c) 2015 Clyde Stanfield                                          #
+#                                                                             #
+# Permission is hereby granted, free of charge, to any person obtaining a     #
+# copy of this software and associated documentation files (the "Software"),  #
+# to deal in the Software without restriction, including without limitation   #
+# the rights to use, copy, modify, merge, publish, distribute, sublicense,    #
+# and/or sell copies of the Software, and to permit persons to whom the       #
+# Software is furnished to do so, subject to the following conditions:        #
+#                                                                             #
+# The above copyright notice and this permission notice shall be included in  #
+# all copies or substantial portions of the Software.                         #
+#                                                                             #
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR  #
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,    #
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE #
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER      #
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING     #
+# FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER         #
+# DEALINGS IN THE SOFTWARE.                                                   #
+###############################################################################
+"""
+Test DAT file verification
+"""
+from export.verify import load_dat, match, load_cache, save_cache
+from export.verify import file_hashes, verify_file
+from export.cartridge import PROG_ROM_SIZE, CHR_ROM_SIZE
+import unittest
+import hashlib
+import numpy
+import os
+
+class TestVerify(unittest.TestCase):
+    """
+    Test verifying roms against a DAT file
+    """
+    def setUp(self):
+        raw = 'NES\x1a\x01\x01\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+        self.filename = 'temp_verify.nes'
+        with open(self.filename, 'wb') as nes_file:
+            nes_file.write(raw)
+            numpy.random.randint(256, size=PROG_ROM_SIZE + CHR_ROM_SIZE * 2) \
+                    .astype('uint8').tofile(nes_file)
+
+        with open(self.filename, 'rb') as nes_file:
+            self.sha1 = hashlib.sha1(nes_file.read()[16:]).hexdigest()
+
+        self.dat_filename = 'temp_verify.dat'
+        with open(self.dat_filename, 'w') as dat_file:
+            dat_file.write('<?xml version="1.0"?>\n<datafile>\n' \
+                    '<game name="Other Game">\n' \
+                    '<rom name="Other Game.nes" size="100" ' \
+                    'crc="DEADBEEF"/>\n' \
+                    '</game>\n' \
+                    '<game name="Test Game">\n' \
+                    '<rom name="Test Game.nes" size="24576" ' \
+                    'crc="DEADBEEF" sha1="' + self.sha1.upper() + '"/>\n' \
+                    '</game>\n</datafile>\n')
+
+        self.cache_filename = 'temp_verify.json'
+
+    def tearDown(self):
+        for filename in [self.filename, self.dat_filename,
+                         self.cache_filename]:
+            if os.path.isfile(filename):
+                os.remove(filename)
+
+    def test_load_dat(self):
+        """
+        Ensure the DAT entries are indexed by lower case hash
+        """
+        index = load_dat(self.dat_filename)
+        self.assertEqual(len(index['SHA1'][self.sha1]), 1)
+        entry = index['SHA1'][self.sha1][0]
+        self.assertEqual(entry['GAME'], 'Test Game')
+        self.assertEqual(entry['NAME'], 'Test Game.nes')
+        self.assertEqual(entry['SIZE'], 24576)
+
+        # Both games share the same CRC32
+        entries = index['CRC32']['deadbeef']
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]['GAME'], 'Other Game')
+        self.assertTrue(entries[1] is entry)
+        self.assertEqual(len(index['MD5']), 0)
+
+    def test_verify_file(self):
+        """
+        Ensure a rom matches by its header-less hash
+        """
+        index = load_dat(self.dat_filename)
+        entry = verify_file(self.filename, index)
+        self.assertEqual(entry['GAME'], 'Test Game')
+
+        hashes = file_hashes(self.filename)
+        hashes['ROM']['SHA1'] = '0' * 40
+        hashes['ROM']['CRC32'] = '0' * 8
+        self.assertEqual(match(index, hashes), None)
+
+    def test_crc32_size(self):
+        """
+        Ensure a CRC32 only match is rejected if the size is wrong
+        """
+        index = load_dat(self.dat_filename)
+        hashes = {'ROM': {'SIZE': 50, 'CRC32': 'deadbeef',
+                          'MD5': '', 'SHA1': ''},
+                  'FILE': {'SIZE': 66, 'CRC32': '00000000',
+                           'MD5': '', 'SHA1': ''}}
+        self.assertEqual(match(index, hashes), None)
+
+        # The entry with the matching size wins, wherever it is listed
+        hashes['ROM']['SIZE'] = 24576
+        self.assertEqual(match(index, hashes)['GAME'], 'Test Game')
+        hashes['ROM']['SIZE'] = 100
+        self.assertEqual(match(index, hashes)['GAME'], 'Other Game')
+
+    def test_cache(self):
+        """
+        Ensure unchanged files are served from the cache
+        """
+        cache = load_cache(self.cache_filename)
+        self.assertEqual(cache, dict())
+
+        hashes = file_hashes(self.filename, cache)
+        self.assertEqual(hashes['ROM']['SHA1'], self.sha1)
+        save_cache(cache, self.cache_filename)
+
+        # Poison the cached value to prove the file is not read again
+        cache = load_cache(self.cache_filename)
+        key = os.path.abspath(self.filename)
+        cache[key]['HASHES']['ROM']['SHA1'] = 'cached'
+        self.assertEqual(file_hashes(self.filename, cache)['ROM']['SHA1'],
+                         'cached')
+
+        # A changed modification time forces the file to be hashed again
+        cache[key]['MTIME'] -= 1
+        self.assertEqual(file_hashes(self.filename, cache)['ROM']['SHA1'],
+                         self.sha1)
+
+if __name__ == '__main__':
+    unittest.main()